@@ -0,0 +1,118 @@
+"""
+In-process admission control.
+
+Every route belongs to a class. Each (client, class) pair draws from its own
+token bucket, and CPU-heavy classes also have a cap on requests running at
+once. Requests over either limit are rejected immediately with a
+Retry-After hint instead of queueing behind the work already admitted.
+"""
+
+import math
+import time
+from threading import BoundedSemaphore, Lock
+
+from cache import LRUCache
+
+# Route class limits: sustained requests per second and burst size per
+# client, and the number of requests of the class allowed to run at once
+LIMITS = {
+    "analyze": {"rate": 0.2, "burst": 2, "concurrency": 2},
+    "password": {"rate": 1.0, "burst": 5, "concurrency": 4},
+    "list": {"rate": 2.0, "burst": 10, "concurrency": 8},
+    "default": {"rate": 20.0, "burst": 40, "concurrency": None},
+}
+
+ROUTE_CLASSES = {
+    "upload_file": "analyze",
+    "add_user": "password",
+    "verify_user": "password",
+    "get_all_parks": "list",
+    "get_all_spots_by_park_id": "list",
+    "get_all_actions_by_category_id": "list",
+    "get_all_spots": "list",
+    "get_all_actions": "list",
+    "get_all_categories": "list",
+    "get_all_users": "list",
+    "get_all_shopping_items": "list",
+    "search_all": "list",
+}
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at rate tokens per second
+    """
+
+    def __init__(self, rate, burst):
+        """
+        Initialize a full bucket
+        """
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self):
+        """
+        Take one token, returning 0 on success or the seconds until one is
+        available
+        """
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+class AdmissionController:
+    """
+    Token buckets per client and route class plus concurrency caps per class
+    """
+
+    def __init__(self, limits=LIMITS, max_clients=10000):
+        """
+        Initialize a controller, tracking at most max_clients buckets
+        """
+        self.limits = limits
+        self.buckets = LRUCache(max_size=max_clients)
+        self.slots = {route_class: BoundedSemaphore(limit["concurrency"])
+                      for route_class, limit in limits.items() if limit["concurrency"]}
+        self.lock = Lock()
+
+    def admit(self, client, route_class):
+        """
+        Try to admit a request. Returns None when admitted, otherwise the
+        (status code, retry after seconds) to reject it with. An admitted
+        request must be released once it finishes.
+        """
+        limit = self.limits[route_class]
+        with self.lock:
+            bucket = self.buckets.get((client, route_class))
+            if bucket is None:
+                bucket = TokenBucket(limit["rate"], limit["burst"])
+                self.buckets.set((client, route_class), bucket)
+            wait = bucket.take()
+        if wait:
+            return 429, int(math.ceil(wait))
+
+        slots = self.slots.get(route_class)
+        if slots is not None and not slots.acquire(blocking=False):
+            return 503, 1
+        return None
+
+    def release(self, route_class):
+        """
+        Free the concurrency slot held by an admitted request
+        """
+        slots = self.slots.get(route_class)
+        if slots is not None:
+            slots.release()
+
+
+def route_class(endpoint):
+    """
+    Return the route class of a Flask endpoint name
+    """
+    return ROUTE_CLASSES.get(endpoint, "default")
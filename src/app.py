@@ -1,13 +1,25 @@
 import json
+import math
 import os
 from datetime import datetime
 import base64
-
-from db import db, Park, Spot, Action, Shopping_item, User, Image, Action_category
-from flask import Flask, request, send_file, jsonify
+from threading import Thread
+
+from db import db, Park, Spot, Action, Shopping_item, User, Image, Action_category, Redemption, assoc_actions_categories, assoc_users_actions
+from cache import LRUCache
+from listing import list_users, list_actions, list_spots
+from catalog import get_catalog, invalidate_catalog
+from schema import upgrade_schema
+from search import KINDS, create_search_index, search
+import cascade
+from lookup import lookup, lookup_stats
+from admission import AdmissionController, route_class
+from moderation import MODELS as MODERATED, create_moderation_queue, pending_counts, pending_page, pending_ids
+from flask import Flask, request, send_file, jsonify, g
 from hashlib import pbkdf2_hmac
 from dotenv import load_dotenv
 from flask_cors import CORS
+from sqlalchemy.exc import OperationalError
 from data_visualization import process_csv, create_heatmap
 
 app = Flask(__name__)
@@ -22,13 +34,28 @@ load_dotenv()
 salting = os.environ.get("PASSWORD_SALT")
 iterations = int(os.environ.get("NUMBER_OF_ITERATIONS"))
 
-app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///%s" % db_filename
+app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get(
+    "DATABASE_URI", "sqlite:///%s" % db_filename)
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-app.config["SQLALCHEMY_ECHO"] = True
+app.config["SQLALCHEMY_ECHO"] = os.environ.get("SQLALCHEMY_ECHO", "on") != "off"
+app.config["ADMISSION_CONTROL"] = os.environ.get("ADMISSION_CONTROL", "on") != "off"
+
+FEED_PAGE_SIZE = 20
+FEED_MAX_PAGE_SIZE = 100
+FEED_MAX_CACHED_PAGES = 16
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE_SIZE = 100
+MODERATION_PAGE_SIZE = 20
+MODERATION_MAX_PAGE_SIZE = 100
+user_feed_cache = LRUCache(max_size=512)
+admission = AdmissionController()
 
 db.init_app(app)
 with app.app_context():
     db.create_all()
+    upgrade_schema()
+    create_search_index()
+    create_moderation_queue()
 
 #### HELPER METHODS ####
 
@@ -39,6 +66,150 @@ def hash_password(password):
     return secret_password
 
 
+def adjust_counters(model, row_id, **deltas):
+    """
+    Atomically add deltas to the counter columns of a single row, inside the
+    current transaction
+    """
+    if not deltas:
+        return
+    model.query.filter_by(id=row_id).update(
+        {getattr(model, column): getattr(model, column) + delta
+         for column, delta in deltas.items()},
+        synchronize_session=False)
+
+
+def release_category_counters(action_ids):
+    """
+    Decrement the action counter of every category linked to the given actions
+    """
+    rows = db.session.query(assoc_actions_categories.c.category_id, db.func.count()) \
+        .filter(assoc_actions_categories.c.action_id.in_(action_ids)) \
+        .group_by(assoc_actions_categories.c.category_id).all()
+    for category_id, count in rows:
+        adjust_counters(Action_category, category_id, action_count=-count)
+
+
+def encode_feed_cursor(action):
+    """
+    Build the keyset cursor pointing just after the given action
+    """
+    return "%s_%d" % (action.time.isoformat(), action.id)
+
+
+def decode_feed_cursor(cursor):
+    """
+    Parse a keyset cursor into its (time, id) pair, or None if malformed
+    """
+    try:
+        time, action_id = cursor.rsplit("_", 1)
+        return datetime.fromisoformat(time), int(action_id)
+    except ValueError:
+        return None
+
+
+def invalidate_user_feeds(user_ids):
+    """
+    Drop the cached activity feed pages of the given users
+    """
+    user_feed_cache.invalidate(*user_ids)
+
+
+def remove_park(park_id):
+    """
+    Delete a park and everything under it with set-based statements
+    """
+    release_category_counters(
+        db.select(Action.id).join(Spot, Action.spot_id == Spot.id).where(Spot.park_id == park_id))
+    cascade.delete_park(park_id)
+    db.session.commit()
+    user_feed_cache.clear()
+
+
+def remove_spots(spot_ids):
+    """
+    Delete spots and everything under them with set-based statements,
+    releasing their counters, without committing
+    """
+    release_category_counters(
+        db.select(Action.id).where(Action.spot_id.in_(spot_ids)))
+    rows = db.session.query(Spot.park_id, db.func.count()) \
+        .filter(Spot.id.in_(spot_ids)).group_by(Spot.park_id).all()
+    for park_id, count in rows:
+        adjust_counters(Park, park_id, spot_count=-count)
+    cascade.delete_spots(spot_ids)
+
+
+def remove_spot(spot_id):
+    """
+    Delete a spot and everything under it
+    """
+    remove_spots([spot_id])
+    db.session.commit()
+    user_feed_cache.clear()
+
+
+def remove_actions(actions):
+    """
+    Delete actions with set-based statements, releasing their counters,
+    without committing. Returns the ids of the users whose feeds changed.
+    """
+    user_ids = set()
+    for action in actions:
+        spot_deltas = {"action_count": -1}
+        if action.is_verified:
+            spot_deltas["verified_minutes"] = -action.minute_duration
+        adjust_counters(Spot, action.spot_id, **spot_deltas)
+        user_ids.update(user.id for user in action.users)
+    action_ids = [action.id for action in actions]
+    release_category_counters(action_ids)
+    cascade.delete_actions(action_ids)
+    return user_ids
+
+
+def award_action(action):
+    """
+    Mark an action verified and credit its users with points and minutes
+    """
+    action.is_verified = True
+    max_base_points = max(
+        (category.point for category in action.categories), default=0)
+
+    for user in action.users:
+        user.points += max_base_points * action.minute_duration
+        user.volunteered_minutes += action.minute_duration
+    adjust_counters(Spot, action.spot_id,
+                    verified_minutes=action.minute_duration)
+
+
+def run_deletion(remove, *args):
+    """
+    Run a deletion within the request, or on a background thread when the
+    request asks for it with ?background=true
+    """
+    if request.args.get("background") != "true":
+        remove(*args)
+        return success_response({})
+
+    def target():
+        with app.app_context():
+            try:
+                remove(*args)
+            except Exception:
+                db.session.rollback()
+                app.logger.exception("background deletion failed")
+
+    Thread(target=target, daemon=True).start()
+    return success_response({"status": "deleting"}, 202)
+
+
+def wants_summary():
+    """
+    Whether the request asks for counters instead of nested relationships
+    """
+    return request.args.get("view") == "summary"
+
+
 #### GENERALIZE RETURN ####
 def success_response(body, code=200):
     return json.dumps(body, default=str), code
@@ -48,6 +219,46 @@ def failure_response(message, code=404):
     return json.dumps({"error": message}), code
 
 
+@app.before_request
+def admit_request():
+    """
+    Shed requests over their client's rate or their route's concurrency cap
+    """
+    if not app.config["ADMISSION_CONTROL"] or request.method == "OPTIONS" \
+            or request.endpoint is None:
+        return None
+    endpoint_class = route_class(request.endpoint)
+    rejection = admission.admit(request.remote_addr, endpoint_class)
+    if rejection is not None:
+        code, retry_after = rejection
+        message = "Too many requests" if code == 429 else "Server busy"
+        body, code = failure_response(message, code)
+        return body, code, {"Retry-After": str(retry_after)}
+    g.admitted_class = endpoint_class
+    return None
+
+
+@app.teardown_request
+def release_request(exception=None):
+    """
+    Free the concurrency slot of an admitted request
+    """
+    endpoint_class = g.pop("admitted_class", None)
+    if endpoint_class is not None:
+        admission.release(endpoint_class)
+
+
+@app.after_request
+def report_lookup_stats(response):
+    """
+    Expose the request-scoped lookup cache hit and miss counts
+    """
+    stats = lookup_stats()
+    response.headers["X-Lookup-Cache"] = "hits=%d; misses=%d" % (
+        stats["hits"], stats["misses"])
+    return response
+
+
 @app.route("/")
 def front_page():
     return "Hello! :D"
@@ -76,15 +287,20 @@ def create_park():
 
 @app.route("/api/park/")
 def get_all_parks():
-    parks = [park.serialize() for park in Park.query.all()]
+    if wants_summary():
+        parks = [park.summary_serialize() for park in Park.query.all()]
+    else:
+        parks = [park.serialize() for park in Park.query.all()]
     return success_response({"parks": parks})
 
 
 @app.route("/api/park/<int:park_id>/")
 def get_park_by_id(park_id):
-    park = Park.query.filter_by(id=park_id).first()
+    park = lookup(Park, id=park_id)
     if park is None:
         return failure_response("Park not found!")
+    if wants_summary():
+        return success_response(park.summary_serialize())
     return success_response(park.serialize())
 
 
@@ -93,9 +309,7 @@ def delete_park_by_id(park_id):
     park = Park.query.filter_by(id=park_id).first()
     if park is None:
         return failure_response("Park not found!")
-    db.session.delete(park)
-    db.session.commit()
-    return success_response({})
+    return run_deletion(remove_park, park_id)
 
 # --------- Spot Routes ------------
 
@@ -110,9 +324,11 @@ def create_spot(park_id):
 
     if name is None or longitude is None or latitude is None:
         return failure_response("Name, longitude, and latitude are required!")
+    if lookup(Park, id=park_id) is None:
+        return failure_response("Park not found!")
 
     if suggester_id is not None:
-        suggester = User.query.filter_by(id=suggester_id).first()
+        suggester = lookup(User, id=suggester_id)
         if suggester is None:
             return failure_response("Suggester not found!")
         spot = Spot(name=name, longitude=longitude,
@@ -122,6 +338,7 @@ def create_spot(park_id):
                     latitude=latitude, park_id=park_id, is_verified=True)
 
     db.session.add(spot)
+    adjust_counters(Park, park_id, spot_count=1)
     db.session.commit()
     return success_response(spot.serialize(), 201)
 
@@ -145,7 +362,10 @@ def get_all_spots_by_park_id(park_id):
 
 @app.route("/api/spot/")
 def get_all_spots():
-    spots = [spot.serialize() for spot in Spot.query.all()]
+    if wants_summary():
+        spots = [spot.summary_serialize() for spot in Spot.query.all()]
+    else:
+        spots = list_spots()
     return success_response({"spots": spots})
 
 
@@ -154,6 +374,8 @@ def get_spot_by_id(spot_id):
     spot = Spot.query.filter_by(id=spot_id).first()
     if spot is None:
         return failure_response("Spot not found!")
+    if wants_summary():
+        return success_response(spot.summary_serialize())
     return success_response(spot.serialize())
 
 
@@ -162,9 +384,7 @@ def delete_spot_by_id(spot_id):
     spot = Spot.query.filter_by(id=spot_id).first()
     if spot is None:
         return failure_response("Spot not found!")
-    db.session.delete(spot)
-    db.session.commit()
-    return success_response({})
+    return run_deletion(remove_spot, spot_id)
 
 
 @app.route("/api/spot/<int:spot_id>/image/", methods=["POST"])
@@ -179,6 +399,7 @@ def upload_spot_image(spot_id):
     image = Image(spot_id=spot_id, binary=base64image)
     spot.images_id.append(image)
     db.session.add(image)
+    db.session.commit()
     return success_response({})
 
 
@@ -187,7 +408,7 @@ def get_spot_image(spot_id):
     spot = Spot.query.filter_by(id=spot_id).first()
     if spot is None:
         return failure_response("Spot not found!")
-    images = [image.binary() for image in spot.images_id]
+    images = [image.binary for image in spot.images_id]
     if not images:
         return failure_response("Images not found!")
     return jsonify(images)
@@ -219,18 +440,22 @@ def create_action(spot_id):
     action = Action(title=title, description=description,
                     spot_id=spot_id, time=time, minute_duration=minute_duration)
     for category in categories:
-        category = Action_category.query.filter_by(name=category).first()
+        category = lookup(Action_category, name=category)
         if category is None:
             return failure_response("Category not found!")
         action.categories.append(category)
     for user in users_name:
-        user = User.query.filter_by(username=user).first()
+        user = lookup(User, username=user)
         if user is None:
             return failure_response("User not found!")
         action.users.append(user)
 
     db.session.add(action)
+    adjust_counters(Spot, spot_id, action_count=1)
+    for category in action.categories:
+        adjust_counters(Action_category, category.id, action_count=1)
     db.session.commit()
+    invalidate_user_feeds([user.id for user in action.users])
     return success_response(action.serialize(), 201)
 
 
@@ -241,35 +466,74 @@ def verify_action(action_id):
         return failure_response("Action not found!")
     if action.is_verified:
         return failure_response("Action already verified!")
-    action.is_verified = True
-    max_base_points = max(category.points for category in action.categories)
-
-    for user in action.users:
-        user.points += max_base_points * action.minute_duration
-        user.volunteered_minutes += action.minute_duration
+    award_action(action)
 
     db.session.commit()
+    invalidate_user_feeds([user.id for user in action.users])
     return success_response(action.serialize(), 201)
 
 
 @app.route("/api/action/")
 def get_all_actions():
-    actions = [action.simple_serialize() for action in Action.query.all()]
+    actions = list_actions()
     return success_response({"actions": actions})
 
 
 @app.route("/api/spot/<int:spot_id>/action/")
 def get_all_actions_by_spot_id(spot_id):
     actions = [action.simple_serialize()
-               for action in Action.query.filter_by(spot_id=spot_id).all()]
+               for action in Action.query.options(db.selectinload(Action.users))
+               .filter_by(spot_id=spot_id).all()]
     return success_response({"actions": actions})
 
+
 @app.route("/api/users/<int:user_id>/action")
 def get_all_actions_by_user_id(user_id):
-    user = User.query.filter_by(id=user_id).first()
-    actions = [action.simple_serialize()
-               for action in Action.query.filter_by(users=user).all()]
-    return success_response({"actions": actions})
+    """
+    Endpoint for the activity feed of a user, newest first, paginated with
+    the `cursor` returned by the previous page
+    """
+    cursor = request.args.get("cursor")
+    try:
+        limit = int(request.args.get("limit", FEED_PAGE_SIZE))
+    except ValueError:
+        return failure_response("limit must be an integer", 400)
+    if limit < 1:
+        return failure_response("limit must be positive", 400)
+    limit = min(limit, FEED_MAX_PAGE_SIZE)
+
+    generation = user_feed_cache.generation(user_id)
+    pages = user_feed_cache.get(user_id)
+    if pages is not None and (cursor, limit) in pages:
+        return success_response(pages[(cursor, limit)])
+
+    if lookup(User, id=user_id) is None:
+        return failure_response("user not found")
+
+    query = Action.query.options(db.selectinload(Action.users)) \
+        .join(assoc_users_actions, assoc_users_actions.c.action_id == Action.id) \
+        .filter(assoc_users_actions.c.user_id == user_id)
+    if cursor is not None:
+        position = decode_feed_cursor(cursor)
+        if position is None:
+            return failure_response("invalid cursor", 400)
+        time, action_id = position
+        query = query.filter(db.or_(
+            Action.time < time,
+            db.and_(Action.time == time, Action.id < action_id)))
+    rows = query.order_by(Action.time.desc(), Action.id.desc()) \
+        .limit(limit + 1).all()
+
+    page = {
+        "actions": [action.simple_serialize() for action in rows[:limit]],
+        "next_cursor": encode_feed_cursor(rows[limit - 1]) if len(rows) > limit else None
+    }
+    pages = dict(pages or {})
+    if len(pages) >= FEED_MAX_CACHED_PAGES:
+        pages.clear()
+    pages[(cursor, limit)] = page
+    user_feed_cache.set(user_id, pages, generation=generation)
+    return success_response(page)
 
 
 @app.route("/api/action/<int:action_id>/", methods=["DELETE"])
@@ -277,15 +541,16 @@ def delete_action_by_id(action_id):
     action = Action.query.filter_by(id=action_id).first()
     if action is None:
         return failure_response("Action not found!")
-    db.session.delete(action)
+    user_ids = remove_actions([action])
     db.session.commit()
+    invalidate_user_feeds(user_ids)
     return success_response({})
 
 
 @app.route("/api/action/<int:action_id>/image/", methods=["POST"])
 def add_action_image(action_id):
-    images = request.files["images"]  # TODO load from list of images
-    if images is None:
+    images = request.files.getlist("images")
+    if not images:
         return failure_response("Images are required!")
 
     action = Action.query.filter_by(id=action_id).first()
@@ -332,16 +597,22 @@ def create_category():
 
 @app.route("/api/category/")
 def get_all_categories():
-    categories = [category.serialize()
-                  for category in Action_category.query.all()]
+    if wants_summary():
+        categories = [category.summary_serialize()
+                      for category in Action_category.query.all()]
+    else:
+        categories = [category.serialize()
+                      for category in Action_category.query.all()]
     return success_response({"categories": categories})
 
 
 @app.route("/api/category/<int:category_id>/")
 def get_category_by_id(category_id):
-    category = Action_category.query.filter_by(id=category_id).first()
+    category = lookup(Action_category, id=category_id)
     if category is None:
         return failure_response("Category not found!")
+    if wants_summary():
+        return success_response(category.summary_serialize())
     return success_response(category.serialize())
 
 
@@ -359,7 +630,7 @@ def delete_category_by_id(category_id):
 def get_all_actions_by_category_id(category_id):
     if category_id is None:
         return failure_response("Category id is required!")
-    category = Action_category.query.filter_by(id=category_id).first()
+    category = lookup(Action_category, id=category_id)
     if category is None:
         return failure_response("Category not found!")
     actions = [action.serialize() for action in category.actions]
@@ -370,28 +641,103 @@ def get_all_actions_by_category_id(category_id):
 
 @app.route("/api/shopping_item/", methods=["POST"])
 def create_shopping_item():
-    body = json.loads(request.data)
+    body = request.form
     name = body.get("name")
-    price = body.get("price")
+    price = body.get("price", type=float)
     description = body.get("description")
-    image = request.files["image"]
-    image = Image(binary=base64.b64encode(image.read()).decode("utf-8"))
+    stock = body.get("stock", type=int)
+    image = request.files.get("image")
 
     if name is None or price is None or description is None:
         return failure_response("Name and price are required!")
     shopping_item = Shopping_item(
-        name=name, price=price, description=description)
-    shopping_item.image = image
+        name=name, price=price, description=description, stock=stock)
     db.session.add(shopping_item)
+    if image is not None and image.filename != "":
+        image = Image(binary=base64.b64encode(image.read()).decode("utf-8"))
+        shopping_item.image = image
+        db.session.add(image)
     db.session.commit()
+    invalidate_catalog()
     return success_response(shopping_item.serialize(), 201)
 
 
 @app.route("/api/shopping_item/")
 def get_all_shopping_items():
-    shopping_items = [shopping_item.serialize()
-                      for shopping_item in Shopping_item.query.all()]
-    return success_response({"shopping_items": shopping_items})
+    return success_response({"shopping_items": get_catalog()})
+
+
+@app.route("/api/shopping_item/<int:item_id>/image/")
+def get_shopping_item_image(item_id):
+    image = Image.query.filter_by(shopping_item_id=item_id).first()
+    if image is None:
+        return failure_response("Image not found!")
+    return success_response(image.serialize())
+
+
+@app.route("/api/shopping_item/<int:item_id>/", methods=["DELETE"])
+def delete_shopping_item(item_id):
+    if Shopping_item.query.filter_by(id=item_id).first() is None:
+        return failure_response("Shopping item not found!")
+    cascade.delete_shopping_item(item_id)
+    db.session.commit()
+    invalidate_catalog()
+    return success_response({})
+
+
+@app.route("/api/shopping_item/<int:item_id>/redeem/", methods=["POST"])
+def redeem_shopping_item(item_id):
+    """
+    Endpoint for spending user points on a shopping item. Stock and points
+    are taken with conditional UPDATEs in one transaction, so concurrent
+    redemptions can neither oversell nor overdraw.
+    """
+    body = json.loads(request.data)
+    user_id = body.get("user_id")
+    quantity = body.get("quantity", 1)
+    if user_id is None:
+        return failure_response("User id is required!", 400)
+    if not isinstance(user_id, int) or isinstance(user_id, bool):
+        return failure_response("User id must be an integer!", 400)
+    if not isinstance(quantity, int) or isinstance(quantity, bool) or quantity < 1:
+        return failure_response("Quantity must be a positive integer!", 400)
+
+    item = db.session.query(Shopping_item.price, Shopping_item.stock) \
+        .filter_by(id=item_id).first()
+    if item is None:
+        return failure_response("Shopping item not found!")
+    cost = int(math.ceil(item.price * quantity))
+
+    try:
+        reserved = Shopping_item.query.filter(
+            Shopping_item.id == item_id,
+            db.or_(Shopping_item.stock.is_(None), Shopping_item.stock >= quantity)
+        ).update({Shopping_item.stock: Shopping_item.stock - quantity},
+                 synchronize_session=False)
+        if not reserved:
+            db.session.rollback()
+            return failure_response("Out of stock!", 409)
+
+        charged = User.query.filter(User.id == user_id, User.points >= cost) \
+            .update({User.points: User.points - cost}, synchronize_session=False)
+        if not charged:
+            db.session.rollback()
+            if User.query.filter_by(id=user_id).first() is None:
+                return failure_response("user not found")
+            return failure_response("Not enough points!", 409)
+
+        redemption = Redemption(user_id=user_id, shopping_item_id=item_id,
+                                quantity=quantity, points=cost, time=datetime.now())
+        db.session.add(redemption)
+        db.session.commit()
+    except OperationalError:
+        db.session.rollback()
+        body, code = failure_response("Shop is busy, try again later", 503)
+        return body, code, {"Retry-After": "1"}
+
+    if item.stock is not None:
+        invalidate_catalog()
+    return success_response(redemption.serialize(), 201)
 
 # --------- Users Routes ------------
 
@@ -402,7 +748,7 @@ def get_all_users():
     Endpoint for getting all users
     """
 
-    users = [user.simple_serialize() for user in User.query.all()]
+    users = list_users()
     return success_response({"users": users})
 
 
@@ -441,7 +787,7 @@ def get_user_by_id(user_id):
     """
     Endpoint for getting user by id
     """
-    user = User.query.filter_by(id=user_id).first()
+    user = lookup(User, id=user_id)
     if user is None:
         return failure_response("user not found")
 
@@ -453,7 +799,7 @@ def get_user_by_username(username):
     """
     Endpoint for getting user by username
     """
-    user = User.query.filter_by(username=username).first()
+    user = lookup(User, username=username)
     if user is None:
         return failure_response("user not found")
 
@@ -471,8 +817,15 @@ def delete_user_by_id(user_id):
     if user is None:
         return failure_response("user not found", 404)
 
-    db.session.delete(user)
+    # Feeds of users sharing an action embed this user's name
+    shared_actions = db.select(assoc_users_actions.c.action_id) \
+        .where(assoc_users_actions.c.user_id == user_id)
+    co_user_ids = [row_id for (row_id,) in db.session.query(assoc_users_actions.c.user_id)
+                   .filter(assoc_users_actions.c.action_id.in_(shared_actions))
+                   .distinct().all()]
+    cascade.delete_user(user_id)
     db.session.commit()
+    invalidate_user_feeds(co_user_ids + [user_id])
     return success_response({})
 
 
@@ -488,7 +841,7 @@ def verify_user():
     if username is None or password is None:
         return failure_response("missing parameter", 400)
 
-    user = User.query.filter_by(username=username).first()
+    user = lookup(User, username=username)
 
     if user is None:
         return failure_response("user not found", 404)
@@ -498,7 +851,7 @@ def verify_user():
     if user.password == hashed_password:
         res = {
             "verify": True,
-            "user_id": user.serialize().get("id")
+            "user_id": user.id
         }
         return success_response(res)
     else:
@@ -506,6 +859,115 @@ def verify_user():
         return success_response(res, 403)
 
 
+# --------- Moderation Routes ------------
+
+
+@app.route("/api/moderation/")
+def get_moderation_counts():
+    """
+    Endpoint for the number of pending spots and actions
+    """
+    return success_response(pending_counts())
+
+
+@app.route("/api/moderation/<string:kind>/")
+def get_moderation_queue(kind):
+    """
+    Endpoint for a page of pending items, oldest first, continuing after the
+    `after` id returned by the previous page
+    """
+    if kind not in MODERATED:
+        return failure_response("Unknown moderation queue!")
+    try:
+        after_id = int(request.args.get("after", 0))
+        limit = int(request.args.get("limit", MODERATION_PAGE_SIZE))
+    except ValueError:
+        return failure_response("after and limit must be integers", 400)
+    if limit < 1:
+        return failure_response("limit must be positive", 400)
+    limit = min(limit, MODERATION_MAX_PAGE_SIZE)
+
+    items = pending_page(kind, after_id, limit)
+    if kind == "spot":
+        serialized = [spot.summary_serialize() for spot in items]
+    else:
+        serialized = [action.serialize() for action in items]
+    return success_response({
+        "items": serialized,
+        "pending": pending_counts().get(kind, 0),
+        "next_after": items[-1].id if len(items) == limit else None
+    })
+
+
+@app.route("/api/moderation/<string:kind>/", methods=["POST"])
+def moderate(kind):
+    """
+    Endpoint for approving and rejecting pending items in one transaction.
+    Rejected items are deleted; ids that are not pending are ignored.
+    """
+    if kind not in MODERATED:
+        return failure_response("Unknown moderation queue!")
+    body = json.loads(request.data)
+    approve = body.get("approve", [])
+    reject = body.get("reject", [])
+    if not isinstance(approve, list) or not isinstance(reject, list) or \
+            not all(isinstance(item_id, int) for item_id in approve + reject):
+        return failure_response("approve and reject must be lists of ids", 400)
+    if set(approve) & set(reject):
+        return failure_response("An item cannot be both approved and rejected!", 400)
+
+    approved = pending_ids(kind, approve) if approve else []
+    rejected = pending_ids(kind, reject) if reject else []
+    user_ids = set()
+    if kind == "spot":
+        if approved:
+            Spot.query.filter(Spot.id.in_(approved)).update(
+                {Spot.is_verified: True}, synchronize_session=False)
+        if rejected:
+            remove_spots(rejected)
+    else:
+        for action in Action.query.filter(Action.id.in_(approved)).all():
+            award_action(action)
+            user_ids.update(user.id for user in action.users)
+        if rejected:
+            user_ids.update(remove_actions(
+                Action.query.filter(Action.id.in_(rejected)).all()))
+    db.session.commit()
+
+    if kind == "spot" and rejected:
+        user_feed_cache.clear()
+    invalidate_user_feeds(user_ids)
+    return success_response({"approved": approved, "rejected": rejected})
+
+
+# --------- Search Routes ------------
+
+
+@app.route("/api/search")
+def search_all():
+    """
+    Endpoint for ranked prefix search over parks, spots and actions
+    """
+    query = request.args.get("q", "")
+    kind = request.args.get("type")
+    if kind is not None and kind not in KINDS:
+        return failure_response("type must be one of park, spot, action", 400)
+    try:
+        limit = int(request.args.get("limit", SEARCH_PAGE_SIZE))
+        offset = int(request.args.get("offset", 0))
+    except ValueError:
+        return failure_response("limit and offset must be integers", 400)
+    if limit < 1 or offset < 0:
+        return failure_response("limit must be positive and offset non-negative", 400)
+    limit = min(limit, SEARCH_MAX_PAGE_SIZE)
+
+    results = search(query, kind=kind, limit=limit, offset=offset)
+    return success_response({
+        "results": results,
+        "next_offset": offset + limit if len(results) == limit else None
+    })
+
+
 @app.route('/api/analyze', methods=['POST'])
 def upload_file():
     file = request.files['file']
@@ -0,0 +1,94 @@
+"""
+Synthetic dataset shared by the benchmarks.
+"""
+
+from collections import Counter
+from datetime import datetime, timedelta
+
+from db import db, Park, Spot, Action, Action_category, Shopping_item, User, Image, \
+    assoc_users_actions, assoc_actions_categories
+
+
+def insert_rows(target, rows):
+    """
+    Bulk insert rows into a model or table, skipping empty batches
+    """
+    if rows:
+        db.session.execute(db.insert(target), rows)
+
+
+def seed(parks=10, spots=200, users=500, actions=2000, categories=8, images=200,
+         shopping_items=50, image_size=4096, password="x"):
+    """
+    Bulk insert a deterministic dataset of the given scale and return the
+    number of rows per table. Ids start at 1 and are contiguous, spots are
+    spread round-robin over parks and actions over spots. Counter columns are
+    filled in to match the inserted rows.
+    """
+    now = datetime.now()
+    binary = "A" * image_size
+    spot_park = {i: (i - 1) % parks + 1 for i in range(1, spots + 1)}
+    action_spot = {i: (i - 1) % spots + 1 for i in range(1, actions + 1)}
+    action_category = {i: (i - 1) % categories + 1 for i in range(1, actions + 1)}
+    action_verified = {i: i % 2 == 0 for i in range(1, actions + 1)}
+
+    spot_counts = Counter(spot_park.values())
+    action_counts = Counter(action_spot.values())
+    category_counts = Counter(action_category.values())
+    verified_minutes = Counter()
+    for i, spot_id in action_spot.items():
+        if action_verified[i]:
+            verified_minutes[spot_id] += 30
+
+    insert_rows(Park, [
+        {"id": i, "name": "park %d" % i, "longitude": -76.5 + i * 0.001,
+         "latitude": 42.4 + i * 0.001, "spot_count": spot_counts[i]}
+        for i in range(1, parks + 1)])
+    insert_rows(User, [
+        {"id": i, "username": "user%d" % i, "password": password, "points": 0,
+         "volunteered_minutes": 0}
+        for i in range(1, users + 1)])
+    insert_rows(Spot, [
+        {"id": i, "name": "spot %d" % i, "longitude": -76.5, "latitude": 42.4,
+         "park_id": park_id, "is_verified": i % 4 != 0,
+         "suggester_id": (i - 1) % users + 1,
+         "action_count": action_counts[i], "verified_minutes": verified_minutes[i]}
+        for i, park_id in spot_park.items()])
+    insert_rows(Action_category, [
+        {"id": i, "name": "category%d" % i, "point": i, "action_count": category_counts[i]}
+        for i in range(1, categories + 1)])
+    insert_rows(Action, [
+        {"id": i, "title": "action %d" % i, "description": "cleanup at spot %d" % spot_id,
+         "spot_id": spot_id, "time": now - timedelta(minutes=i),
+         "is_verified": action_verified[i], "minute_duration": 30}
+        for i, spot_id in action_spot.items()])
+    insert_rows(assoc_users_actions, [
+        {"user_id": (i - 1) % users + 1, "action_id": i} for i in range(1, actions + 1)])
+    insert_rows(assoc_actions_categories, [
+        {"action_id": i, "category_id": category_id}
+        for i, category_id in action_category.items()])
+    insert_rows(Shopping_item, [
+        {"id": i, "name": "item %d" % i, "price": 10.0 * i, "description": "shop item %d" % i}
+        for i in range(1, shopping_items + 1)])
+
+    # Core executemany needs the same keys in every row
+    owners = {"shopping_item_id": None, "spot_id": None, "action_id": None}
+    image_rows = [dict(owners, binary=binary, shopping_item_id=i)
+                  for i in range(1, shopping_items + 1)]
+    for i in range(images):
+        if i % 2 == 0 and spots:
+            image_rows.append(dict(owners, binary=binary, spot_id=i // 2 % spots + 1))
+        elif actions:
+            image_rows.append(dict(owners, binary=binary, action_id=i // 2 % actions + 1))
+    insert_rows(Image, image_rows)
+    db.session.commit()
+
+    return {
+        "parks": parks,
+        "spots": spots,
+        "users": users,
+        "actions": actions,
+        "categories": categories,
+        "images": len(image_rows),
+        "shopping_items": shopping_items
+    }
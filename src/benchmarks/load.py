@@ -0,0 +1,392 @@
+"""
+Load test every route in app.py against a seeded temporary SQLite database.
+
+Run from the src directory:
+
+    python -m benchmarks.load --output results.json
+    python -m benchmarks.load --output new.json --compare results.json
+
+Each route is driven through the Flask test client. Setup requests (creating
+rows that a DELETE or verify route consumes) are not timed. The JSON report
+holds throughput, p50/p95/p99 latency and SQL statements per request for
+every scenario; --compare prints the change against an earlier report and
+exits non-zero when a scenario regressed by more than --threshold.
+"""
+
+import argparse
+import io
+import json
+import math
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+from sqlalchemy import event
+
+from benchmarks.dataset import seed
+
+# Written to the working directory by the analyze route
+HEATMAP_FILE = "pollution_heatmap.html"
+
+
+class Bench:
+    """
+    Application under test together with the state scenarios share
+    """
+
+    def __init__(self, module, scale, rng):
+        """
+        Initialize a bench around an imported app module
+        """
+        self.module = module
+        self.app = module.app
+        self.client = module.app.test_client()
+        self.scale = scale
+        self.rng = rng
+        self.sequence = 0
+        self.statements = 0
+
+    def unique(self, prefix):
+        """
+        Return a name that has not been used by this bench yet
+        """
+        self.sequence += 1
+        return "%s-bench-%d" % (prefix, self.sequence)
+
+    def pick(self, table):
+        """
+        Return a random seeded id of the given table
+        """
+        return self.rng.randint(1, self.scale[table])
+
+    def setup(self, method, path, **kwargs):
+        """
+        Issue an untimed request and return its decoded JSON body
+        """
+        response = self.client.open(path, method=method, **kwargs)
+        if response.status_code >= 400:
+            raise RuntimeError("setup %s %s failed with %d" % (method, path, response.status_code))
+        return json.loads(response.data)
+
+    def new_park(self):
+        """
+        Create a park through the API and return its id
+        """
+        return self.setup("POST", "/api/park/", json={
+            "name": self.unique("park"), "longitude": -76.5, "latitude": 42.4})["id"]
+
+    def new_spot(self):
+        """
+        Create a spot in a seeded park and return its id
+        """
+        return self.setup("POST", "/api/park/%d/spot/" % self.pick("parks"), json={
+            "name": self.unique("spot"), "longitude": -76.5, "latitude": 42.4})["id"]
+
+    def new_action(self):
+        """
+        Create a pending action at a seeded spot and return its id
+        """
+        return self.setup("POST", "/api/spot/%d/action/" % self.pick("spots"), json=self.action_body())["id"]
+
+    def new_category(self):
+        """
+        Create a category through the API and return its id
+        """
+        return self.setup("POST", "/api/category/", json={
+            "name": self.unique("category"), "point": 1})["id"]
+
+    def new_user(self):
+        """
+        Create a user through the API and return its id
+        """
+        return self.setup("POST", "/api/users", json={
+            "username": self.unique("user"), "password": "bench"})["user_id"]
+
+    def new_shopping_item(self):
+        """
+        Create a shopping item without image and return its id
+        """
+        return self.setup("POST", "/api/shopping_item/", data={
+            "name": self.unique("item"), "price": "10", "description": "benchmark item"},
+            content_type="multipart/form-data")["id"]
+
+    def action_body(self):
+        """
+        Request body creating an action for a seeded user and category
+        """
+        return {
+            "title": self.unique("action"),
+            "description": "benchmark action",
+            "users_name": ["user%d" % self.pick("users")],
+            "categories": ["category%d" % self.pick("categories")],
+            "minute_duration": 30
+        }
+
+
+def image_file():
+    """
+    Random upload standing in for an image file
+    """
+    return io.BytesIO(os.urandom(2048)), "bench.png"
+
+
+def csv_file():
+    """
+    Small pollution CSV upload for the analyze route
+    """
+    rows = ["latitude,longitude,pollution"] + [
+        "%f,%f,%d" % (42.4 + i * 0.001, -76.5 + i * 0.001, i % 50) for i in range(200)]
+    return io.BytesIO("\n".join(rows).encode()), "pollution.csv"
+
+
+# Each scenario maps to (method, build) where build returns the request path
+# and keyword arguments for the test client, doing any untimed setup first.
+SCENARIOS = {
+    "front_page": ("GET", lambda b: ("/", {})),
+    "create_park": ("POST", lambda b: ("/api/park/", {"json": {
+        "name": b.unique("park"), "longitude": -76.5, "latitude": 42.4}})),
+    "get_all_parks": ("GET", lambda b: ("/api/park/", {})),
+    "get_all_parks_summary": ("GET", lambda b: ("/api/park/?view=summary", {})),
+    "get_park_by_id": ("GET", lambda b: ("/api/park/%d/" % b.pick("parks"), {})),
+    "delete_park_by_id": ("DELETE", lambda b: ("/api/park/%d/" % b.new_park(), {})),
+    "create_spot": ("POST", lambda b: ("/api/park/%d/spot/" % b.pick("parks"), {"json": {
+        "name": b.unique("spot"), "longitude": -76.5, "latitude": 42.4}})),
+    "verify_spot": ("GET", lambda b: ("/api/spot/%d/verify/" % b.pick("spots"), {})),
+    "get_all_spots_by_park_id": ("GET", lambda b: ("/api/park/%d/spot/" % b.pick("parks"), {})),
+    "get_all_spots": ("GET", lambda b: ("/api/spot/", {})),
+    "get_spot_by_id": ("GET", lambda b: ("/api/spot/%d/" % b.pick("spots"), {})),
+    "delete_spot_by_id": ("DELETE", lambda b: ("/api/spot/%d/" % b.new_spot(), {})),
+    "upload_spot_image": ("POST", lambda b: ("/api/spot/%d/image/" % b.pick("spots"), {
+        "data": {"image": image_file()}, "content_type": "multipart/form-data"})),
+    "get_spot_image": ("GET", lambda b: ("/api/spot/1/image/", {})),
+    "create_action": ("POST", lambda b: ("/api/spot/%d/action/" % b.pick("spots"), {
+        "json": b.action_body()})),
+    "verify_action": ("POST", lambda b: ("/api/action/%d/" % b.new_action(), {})),
+    "get_all_actions": ("GET", lambda b: ("/api/action/", {})),
+    "get_all_actions_by_spot_id": ("GET", lambda b: ("/api/spot/%d/action/" % b.pick("spots"), {})),
+    "get_all_actions_by_user_id": ("GET", lambda b: ("/api/users/%d/action" % b.pick("users"), {})),
+    "delete_action_by_id": ("DELETE", lambda b: ("/api/action/%d/" % b.new_action(), {})),
+    "add_action_image": ("POST", lambda b: ("/api/action/%d/image/" % b.pick("actions"), {
+        "data": {"images": [image_file(), image_file()]}, "content_type": "multipart/form-data"})),
+    "get_action_image": ("GET", lambda b: ("/api/action/1/image/", {})),
+    "create_category": ("POST", lambda b: ("/api/category/", {"json": {
+        "name": b.unique("category"), "point": 1}})),
+    "get_all_categories": ("GET", lambda b: ("/api/category/", {})),
+    "get_category_by_id": ("GET", lambda b: ("/api/category/%d/" % b.pick("categories"), {})),
+    "delete_category_by_id": ("DELETE", lambda b: ("/api/category/%d/" % b.new_category(), {})),
+    "get_all_actions_by_category_id": ("GET", lambda b: (
+        "/api/category/%d/action/" % b.pick("categories"), {})),
+    "create_shopping_item": ("POST", lambda b: ("/api/shopping_item/", {
+        "data": {"name": b.unique("item"), "price": "10", "description": "benchmark item",
+                 "image": image_file()},
+        "content_type": "multipart/form-data"})),
+    "get_all_shopping_items": ("GET", lambda b: ("/api/shopping_item/", {})),
+    "get_shopping_item_image": ("GET", lambda b: (
+        "/api/shopping_item/%d/image/" % b.pick("shopping_items"), {})),
+    "delete_shopping_item": ("DELETE", lambda b: (
+        "/api/shopping_item/%d/" % b.new_shopping_item(), {})),
+    "redeem_shopping_item": ("POST", lambda b: (
+        "/api/shopping_item/%d/redeem/" % b.pick("shopping_items"), {"json": {
+            "user_id": b.scale["users"] + 1, "quantity": 1}})),
+    "get_all_users": ("GET", lambda b: ("/api/users/", {})),
+    "add_user": ("POST", lambda b: ("/api/users", {"json": {
+        "username": b.unique("user"), "password": "bench"}})),
+    "get_user_by_id": ("GET", lambda b: ("/api/users/%d/" % b.pick("users"), {})),
+    "get_user_by_username": ("GET", lambda b: ("/api/users/user%d/" % b.pick("users"), {})),
+    "delete_user_by_id": ("DELETE", lambda b: ("/api/users/%d/" % b.new_user(), {})),
+    "verify_user": ("POST", lambda b: ("/api/users/verify/", {"json": {
+        "username": "bench", "password": "bench"}})),
+    "get_moderation_counts": ("GET", lambda b: ("/api/moderation/", {})),
+    "get_moderation_queue_spots": ("GET", lambda b: ("/api/moderation/spot/", {})),
+    "get_moderation_queue_actions": ("GET", lambda b: ("/api/moderation/action/", {})),
+    "moderate_actions": ("POST", lambda b: ("/api/moderation/action/", {"json": {
+        "approve": [b.new_action()], "reject": [b.new_action()]}})),
+    "search_all": ("GET", lambda b: ("/api/search?q=spot%%20%d" % b.pick("spots"), {})),
+    "upload_file": ("POST", lambda b: ("/api/analyze", {
+        "data": {"file": csv_file()}, "content_type": "multipart/form-data"})),
+}
+
+
+def percentile(values, fraction):
+    """
+    Nearest-rank percentile of an already sorted list
+    """
+    if not values:
+        return None
+    return values[max(0, math.ceil(fraction * len(values)) - 1)]
+
+
+def run_scenario(bench, name, iterations):
+    """
+    Drive one scenario and summarize its latencies, statuses and SQL counts
+    """
+    method, build = SCENARIOS[name]
+    latencies = []
+    statuses = Counter()
+    statements = 0
+    lookups = Counter()
+    for _ in range(iterations):
+        path, kwargs = build(bench)
+        before = bench.statements
+        start = time.perf_counter()
+        response = bench.client.open(path, method=method, **kwargs)
+        latencies.append(time.perf_counter() - start)
+        statements += bench.statements - before
+        statuses[response.status_code] += 1
+        for part in response.headers.get("X-Lookup-Cache", "").split(";"):
+            if "=" in part:
+                key, value = part.strip().split("=")
+                lookups[key] += int(value)
+    latencies.sort()
+    total = sum(latencies)
+    return {
+        "name": name,
+        "method": method,
+        "iterations": iterations,
+        "errors": sum(count for status, count in statuses.items() if status >= 500),
+        "status_codes": {str(status): count for status, count in sorted(statuses.items())},
+        "throughput_rps": round(iterations / total, 2) if total else None,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "sql_statements_per_request": round(statements / iterations, 2),
+        "lookup_hits_per_request": round(lookups["hits"] / iterations, 2),
+        "lookup_misses_per_request": round(lookups["misses"] / iterations, 2)
+    }
+
+
+def load_app(database_path):
+    """
+    Import app.py against the given SQLite file
+    """
+    os.environ["DATABASE_URI"] = "sqlite:///%s" % database_path
+    os.environ["SQLALCHEMY_ECHO"] = "off"
+    os.environ.setdefault("PASSWORD_SALT", "bench")
+    os.environ.setdefault("NUMBER_OF_ITERATIONS", "100000")
+    import app as module
+    module.app.logger.disabled = True
+    return module
+
+
+def current_commit():
+    """
+    Return the git commit being benchmarked, if any
+    """
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report, baseline, threshold):
+    """
+    Print latency and throughput changes against a baseline report and
+    return the names of scenarios that regressed beyond threshold
+    """
+    previous = {result["name"]: result for result in baseline["results"]}
+    regressions = []
+    for result in report["results"]:
+        old = previous.get(result["name"])
+        if old is None or not old["p95_ms"]:
+            continue
+        p95_change = result["p95_ms"] / old["p95_ms"] - 1
+        sql_change = result["sql_statements_per_request"] - old["sql_statements_per_request"]
+        print("%-32s p95 %+7.1f%%  sql/request %+.2f" % (result["name"], p95_change * 100, sql_change),
+              file=sys.stderr)
+        if p95_change > threshold or sql_change > 0:
+            regressions.append(result["name"])
+    return regressions
+
+
+def run(args, database_path):
+    """
+    Seed the database at database_path and run the selected scenarios,
+    returning the report
+    """
+    module = load_app(database_path)
+    module.app.config["ADMISSION_CONTROL"] = args.admission_control
+    db = module.db
+    with module.app.app_context():
+        scale = seed(parks=args.parks, spots=args.spots, users=args.users,
+                     actions=args.actions, categories=args.categories, images=args.images,
+                     shopping_items=args.shopping_items, image_size=args.image_size)
+        bench_user = module.User(username="bench", password=module.hash_password("bench"))
+        bench_user.points = 10 ** 9
+        db.session.add(bench_user)
+        db.session.commit()
+        engine = db.engine
+
+    bench = Bench(module, scale, random.Random(args.seed))
+
+    def count_statement(*_):
+        bench.statements += 1
+
+    event.listen(engine, "before_cursor_execute", count_statement)
+
+    names = [name for name in SCENARIOS if args.only is None or re.search(args.only, name)]
+    heatmap_existed = os.path.exists(HEATMAP_FILE)
+    report = {
+        "commit": current_commit(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "dataset": scale,
+        "iterations": args.iterations,
+        "results": [run_scenario(bench, name, args.iterations) for name in names]
+    }
+    event.remove(engine, "before_cursor_execute", count_statement)
+    if not heatmap_existed and os.path.exists(HEATMAP_FILE):
+        os.remove(HEATMAP_FILE)
+    engine.dispose()
+    return report
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--parks", type=int, default=10)
+    parser.add_argument("--spots", type=int, default=200)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--actions", type=int, default=2000)
+    parser.add_argument("--categories", type=int, default=8)
+    parser.add_argument("--images", type=int, default=200)
+    parser.add_argument("--shopping-items", type=int, default=50)
+    parser.add_argument("--image-size", type=int, default=4096)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--only", help="regular expression selecting scenario names")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--admission-control", action="store_true",
+                        help="keep rate limiting enabled while benchmarking")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--compare", help="earlier JSON report to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="relative p95 increase counted as a regression")
+    args = parser.parse_args()
+    for table in ("parks", "spots", "users", "actions", "categories", "shopping_items"):
+        if getattr(args, table) < 1:
+            parser.error("--%s must be at least 1" % table.replace("_", "-"))
+
+    with tempfile.TemporaryDirectory(prefix="warmer-sun-bench-") as directory:
+        report = run(args, os.path.join(directory, "bench.db"))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        if regressions:
+            print("regressed: %s" % ", ".join(regressions), file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Compare the ORM serializers with the row-tuple fast paths in listing.py.
+
+Run from the src directory:
+
+    python -m benchmarks.serialization --rows 10000
+
+Prints one JSON object per list endpoint with wall time and peak traced
+allocations for both paths.
+"""
+
+import argparse
+import json
+import time
+import tracemalloc
+
+from flask import Flask
+
+from db import db, Spot, Action, Shopping_item, User
+from benchmarks.dataset import seed
+from listing import list_users, list_actions, list_spots, list_shopping_items
+
+
+def measure(fn):
+    """
+    Run fn on a clean session, returning (seconds, peak traced bytes)
+    """
+    db.session.expunge_all()
+    tracemalloc.start()
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    db.session.rollback()
+    return elapsed, peak
+
+
+CASES = {
+    "get_all_users": (
+        lambda: [user.simple_serialize() for user in User.query.all()], list_users),
+    "get_all_actions": (
+        lambda: [action.simple_serialize() for action in Action.query.all()], list_actions),
+    "get_all_spots": (
+        lambda: [spot.serialize() for spot in Spot.query.all()], list_spots),
+    "get_all_shopping_items": (
+        lambda: [item.serialize() for item in Shopping_item.query.all()], list_shopping_items),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--image-size", type=int, default=4096)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        seed(parks=1, spots=args.rows, users=args.rows, actions=args.rows, images=0,
+             shopping_items=args.rows, image_size=args.image_size)
+        for name, (orm_path, fast_path) in CASES.items():
+            orm = min(measure(orm_path) for _ in range(args.repeat))
+            fast = min(measure(fast_path) for _ in range(args.repeat))
+            print(json.dumps({
+                "endpoint": name,
+                "rows": args.rows,
+                "orm_seconds": round(orm[0], 4),
+                "orm_peak_kib": orm[1] // 1024,
+                "fast_seconds": round(fast[0], 4),
+                "fast_peak_kib": fast[1] // 1024,
+                "speedup": round(orm[0] / fast[0], 2) if fast[0] else None
+            }))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+from collections import OrderedDict
+from threading import Lock
+
+
+class LRUCache:
+    """
+    Small thread-safe in-process LRU cache
+    """
+
+    def __init__(self, max_size=256):
+        """
+        Initialize a cache holding at most max_size entries
+        """
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.generations = {}
+        self.epoch = 0
+        self.lock = Lock()
+
+    def get(self, key, default=None):
+        """
+        Return the cached value for key, marking it as recently used
+        """
+        with self.lock:
+            if key not in self.entries:
+                return default
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+    def generation(self, key):
+        """
+        Return a token that changes whenever key is invalidated, to be passed
+        to set() by readers that compute the value without holding the lock
+        """
+        with self.lock:
+            return self.epoch, self.generations.get(key, 0)
+
+    def set(self, key, value, generation=None):
+        """
+        Store value under key, evicting the least recently used entry if full.
+        When a generation token is given, the value is dropped if key was
+        invalidated since the token was taken.
+        """
+        with self.lock:
+            if generation is not None and \
+                    generation != (self.epoch, self.generations.get(key, 0)):
+                return
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, *keys):
+        """
+        Drop the given keys from the cache
+        """
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+                self.generations[key] = self.generations.get(key, 0) + 1
+
+    def clear(self):
+        """
+        Drop every entry from the cache
+        """
+        with self.lock:
+            self.entries.clear()
+            self.generations.clear()
+            self.epoch += 1
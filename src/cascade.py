@@ -0,0 +1,71 @@
+"""
+Set-based deletes for parks, spots, actions, users and shopping items.
+
+The ORM cascades on these models load every child row (including the base64
+payload of each Image) and delete them one by one. These helpers issue one
+DELETE per table instead, selecting children with subqueries so nothing is
+hydrated. They run inside the caller's transaction and do not commit.
+"""
+
+from db import db, Park, Spot, Action, User, Image, Shopping_item, Redemption, \
+    assoc_users_actions, assoc_actions_categories
+
+
+def bulk_delete(query):
+    """
+    Delete the rows matched by query without loading them
+    """
+    return query.delete(synchronize_session=False)
+
+
+def delete_actions(action_ids):
+    """
+    Delete the actions selected by action_ids along with their images and
+    association rows
+    """
+    bulk_delete(Image.query.filter(Image.action_id.in_(action_ids)))
+    db.session.execute(db.delete(assoc_users_actions)
+                       .where(assoc_users_actions.c.action_id.in_(action_ids)))
+    db.session.execute(db.delete(assoc_actions_categories)
+                       .where(assoc_actions_categories.c.action_id.in_(action_ids)))
+    return bulk_delete(Action.query.filter(Action.id.in_(action_ids)))
+
+
+def delete_spots(spot_ids):
+    """
+    Delete the spots selected by spot_ids along with their actions and images
+    """
+    delete_actions(db.select(Action.id).where(Action.spot_id.in_(spot_ids)))
+    bulk_delete(Image.query.filter(Image.spot_id.in_(spot_ids)))
+    return bulk_delete(Spot.query.filter(Spot.id.in_(spot_ids)))
+
+
+def delete_park(park_id):
+    """
+    Delete a park with all of its spots
+    """
+    delete_spots(db.select(Spot.id).where(Spot.park_id == park_id))
+    return bulk_delete(Park.query.filter_by(id=park_id))
+
+
+def delete_user(user_id):
+    """
+    Delete a user with its image and redemptions, detaching its actions and
+    suggested spots
+    """
+    bulk_delete(Image.query.filter_by(user_id=user_id))
+    bulk_delete(Redemption.query.filter_by(user_id=user_id))
+    Spot.query.filter_by(suggester_id=user_id).update(
+        {Spot.suggester_id: None}, synchronize_session=False)
+    db.session.execute(db.delete(assoc_users_actions)
+                       .where(assoc_users_actions.c.user_id == user_id))
+    return bulk_delete(User.query.filter_by(id=user_id))
+
+
+def delete_shopping_item(item_id):
+    """
+    Delete a shopping item with its image and redemptions
+    """
+    bulk_delete(Image.query.filter_by(shopping_item_id=item_id))
+    bulk_delete(Redemption.query.filter_by(shopping_item_id=item_id))
+    return bulk_delete(Shopping_item.query.filter_by(id=item_id))
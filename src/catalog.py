@@ -0,0 +1,38 @@
+"""
+Precomputed shop catalog listing.
+
+The listing only carries image URLs, never the base64 payloads, and is kept
+until an item is created, deleted or its stock changes.
+"""
+
+from threading import Lock
+
+from listing import list_shopping_items
+
+lock = Lock()
+state = {"listing": None, "generation": 0}
+
+
+def get_catalog():
+    """
+    Return the cached catalog listing, building it on a miss
+    """
+    with lock:
+        listing, generation = state["listing"], state["generation"]
+    if listing is not None:
+        return listing
+    listing = list_shopping_items()
+    with lock:
+        # Skip storing a listing built while an invalidation happened
+        if state["generation"] == generation:
+            state["listing"] = listing
+    return listing
+
+
+def invalidate_catalog():
+    """
+    Drop the cached catalog listing
+    """
+    with lock:
+        state["listing"] = None
+        state["generation"] += 1
@@ -1,11 +1,14 @@
 from flask_sqlalchemy import SQLAlchemy
 
+from lookup import lookup
+
 db = SQLAlchemy()
 
 assoc_users_actions = db.Table(
     "association_users_actions",
     db.Column("user_id", db.Integer, db.ForeignKey("user.id")),
-    db.Column("action_id", db.Integer, db.ForeignKey("action.id"))
+    db.Column("action_id", db.Integer, db.ForeignKey("action.id")),
+    db.Index("ix_association_users_actions_user_id", "user_id", "action_id")
 )
 
 assoc_actions_categories = db.Table(
@@ -14,6 +17,13 @@ assoc_actions_categories = db.Table(
     db.Column("category_id", db.Integer, db.ForeignKey("category.id")))
 
 
+def shopping_item_image_url(item_id):
+    """
+    URL serving the image of a shopping item
+    """
+    return "/api/shopping_item/%d/image/" % item_id
+
+
 class User(db.Model):
     """
     User Model
@@ -73,6 +83,7 @@ class Park(db.Model):
     longitude = db.Column(db.Float, nullable=False)
     latitude = db.Column(db.Float, nullable=False)
     spots = db.relationship("Spot", cascade="delete")
+    spot_count = db.Column(db.Integer, nullable=False, default=0)
 
     def __init__(self, **kwargs):
         """
@@ -105,6 +116,18 @@ class Park(db.Model):
             "latitude": self.latitude
         }
 
+    def summary_serialize(self):
+        """
+        Serialize a park object with its spot counter instead of spots field
+        """
+        return {
+            "id": self.id,
+            "name": self.name,
+            "longitude": self.longitude,
+            "latitude": self.latitude,
+            "spot_count": self.spot_count
+        }
+
 
 class Spot(db.Model):
     """
@@ -122,6 +145,11 @@ class Spot(db.Model):
     suggester_id = db.Column(
         db.Integer, db.ForeignKey("user.id"))
     images_id = db.relationship("Image", cascade="delete")
+    action_count = db.Column(db.Integer, nullable=False, default=0)
+    verified_minutes = db.Column(db.Integer, nullable=False, default=0)
+    __table_args__ = (
+        db.Index("ix_spot_pending", "id", sqlite_where=db.text("is_verified = 0")),
+    )
 
     def __init__(self, **kwargs):
         """
@@ -144,7 +172,7 @@ class Spot(db.Model):
             "longitude": self.longitude,
             "latitude": self.latitude,
             "park_id": self.park_id,
-            "park": Park.query.filter_by(id=self.park_id).first().name,
+            "park": lookup(Park, id=self.park_id).name,
             "actions": [action.simple_serialize() for action in self.actions],
             "suggester_id": self.suggester_id,
             "is_verified": self.is_verified
@@ -157,11 +185,26 @@ class Spot(db.Model):
         return {
             "id": self.id,
             "name": self.name,
-            "park": Park.query.filter_by(id=self.park_id).first().name,
+            "park": lookup(Park, id=self.park_id).name,
             "longitude": self.longitude,
             "latitude": self.latitude
         }
 
+    def summary_serialize(self):
+        """
+        Serialize a spot object with its counters instead of actions field
+        """
+        return {
+            "id": self.id,
+            "name": self.name,
+            "park_id": self.park_id,
+            "longitude": self.longitude,
+            "latitude": self.latitude,
+            "is_verified": self.is_verified,
+            "action_count": self.action_count,
+            "verified_minutes": self.verified_minutes
+        }
+
 
 class Action(db.Model):
     """
@@ -179,8 +222,11 @@ class Action(db.Model):
     categories = db.relationship(
         "Action_category", secondary=assoc_actions_categories, back_populates="actions")
     is_verified = db.Column(db.Boolean, nullable=False, default=False)
-    time = db.Column(db.DateTime, nullable=False)
+    time = db.Column(db.DateTime, nullable=False, index=True)
     minute_duration = db.Column(db.Integer, nullable=False, default=0)
+    __table_args__ = (
+        db.Index("ix_action_pending", "id", sqlite_where=db.text("is_verified = 0")),
+    )
 
     def __init__(self, **kwargs):
         """
@@ -233,6 +279,7 @@ class Action_category(db.Model):
     point = db.Column(db.Integer, nullable=False)
     actions = db.relationship(
         "Action", secondary=assoc_actions_categories, back_populates="categories")
+    action_count = db.Column(db.Integer, nullable=False, default=0)
 
     def __init__(self, **kwargs):
         """
@@ -261,6 +308,34 @@ class Action_category(db.Model):
             "name": self.name
         }
 
+    def summary_serialize(self):
+        """
+        Serialize an action category object with its action counter instead of actions field
+        """
+        return {
+            "id": self.id,
+            "name": self.name,
+            "point": self.point,
+            "action_count": self.action_count
+        }
+
+
+class Moderation_queue(db.Model):
+    """
+    Moderation Queue Model, one row per kind of moderated item holding the
+    number of unverified items
+    """
+    __tablename__ = "moderation_queue"
+    kind = db.Column(db.String, primary_key=True)
+    pending = db.Column(db.Integer, nullable=False, default=0)
+
+    def __init__(self, **kwargs):
+        """
+        Initialize a moderation queue object
+        """
+        self.kind = kwargs.get("kind", "")
+        self.pending = kwargs.get("pending", 0)
+
 
 class Shopping_item(db.Model):
     """
@@ -273,6 +348,7 @@ class Shopping_item(db.Model):
     description = db.Column(db.String, nullable=False)
     image = db.relationship("Image", cascade="delete",
                             uselist=False)
+    stock = db.Column(db.Integer)
 
     def __init__(self, **kwargs):
         """
@@ -281,17 +357,58 @@ class Shopping_item(db.Model):
         self.name = kwargs.get("name", "")
         self.price = kwargs.get("price", "")
         self.description = kwargs.get("description", "")
+        self.stock = kwargs.get("stock")
 
     def serialize(self):
         """
-        Serialize a shop object
+        Serialize a shop object, referencing its image by URL
         """
+        has_image = Image.query.with_entities(Image.id) \
+            .filter_by(shopping_item_id=self.id).first() is not None
         return {
             "id": self.id,
             "name": self.name,
             "price": self.price,
             "description": self.description,
-            "image": self.image
+            "stock": self.stock,
+            "image_url": shopping_item_image_url(self.id) if has_image else None
+        }
+
+
+class Redemption(db.Model):
+    """
+    Redemption Model
+    """
+    __tablename__ = "redemption"
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False, index=True)
+    shopping_item_id = db.Column(
+        db.Integer, db.ForeignKey("shopping_item.id"), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False, default=1)
+    points = db.Column(db.Integer, nullable=False)
+    time = db.Column(db.DateTime, nullable=False)
+
+    def __init__(self, **kwargs):
+        """
+        Initialize a redemption object
+        """
+        self.user_id = kwargs.get("user_id")
+        self.shopping_item_id = kwargs.get("shopping_item_id")
+        self.quantity = kwargs.get("quantity", 1)
+        self.points = kwargs.get("points", 0)
+        self.time = kwargs.get("time")
+
+    def serialize(self):
+        """
+        Serialize a redemption object
+        """
+        return {
+            "id": self.id,
+            "user_id": self.user_id,
+            "shopping_item_id": self.shopping_item_id,
+            "quantity": self.quantity,
+            "points": self.points,
+            "time": self.time
         }
 
 
@@ -322,9 +439,3 @@ class Image(db.Model):
             "id": self.id,
             "binary": self.binary
         }
-
-    def binary(self):
-        """
-        Return the binary data of the image
-        """
-        return self.binary
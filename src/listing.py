@@ -0,0 +1,101 @@
+"""
+Read-only fast paths for the list endpoints.
+
+These select only the columns a serializer needs and build the response
+dicts straight from row tuples, skipping ORM hydration, the identity map and
+per-object relationship loads. Each function returns the same shape as the
+matching model serializer.
+"""
+
+from collections import defaultdict
+
+from db import db, Park, Spot, Action, Shopping_item, User, Image, assoc_users_actions, \
+    shopping_item_image_url
+
+
+def users_by_action():
+    """
+    Map every action id to the simple serialization of its users
+    """
+    rows = db.session.execute(
+        db.select(assoc_users_actions.c.action_id, User.id, User.username)
+        .join(User, User.id == assoc_users_actions.c.user_id)).all()
+    users = defaultdict(list)
+    for action_id, user_id, username in rows:
+        users[action_id].append({"id": user_id, "username": username})
+    return users
+
+
+def list_users():
+    """
+    Rows of User.simple_serialize for every user
+    """
+    rows = db.session.execute(db.select(User.id, User.username)).all()
+    return [{"id": user_id, "username": username} for user_id, username in rows]
+
+
+def list_actions():
+    """
+    Rows of Action.simple_serialize for every action
+    """
+    users = users_by_action()
+    rows = db.session.execute(
+        db.select(Action.id, Action.title, Action.time, Action.is_verified)).all()
+    return [{
+        "id": action_id,
+        "title": title,
+        "users": users.get(action_id, []),
+        "time": time,
+        "is_verified": is_verified
+    } for action_id, title, time, is_verified in rows]
+
+
+def list_spots():
+    """
+    Rows of Spot.serialize for every spot
+    """
+    users = users_by_action()
+    actions = defaultdict(list)
+    action_rows = db.session.execute(
+        db.select(Action.spot_id, Action.id, Action.title, Action.time, Action.is_verified)).all()
+    for spot_id, action_id, title, time, is_verified in action_rows:
+        actions[spot_id].append({
+            "id": action_id,
+            "title": title,
+            "users": users.get(action_id, []),
+            "time": time,
+            "is_verified": is_verified
+        })
+    rows = db.session.execute(
+        db.select(Spot.id, Spot.name, Spot.longitude, Spot.latitude, Spot.park_id,
+                  Park.name, Spot.suggester_id, Spot.is_verified)
+        .outerjoin(Park, Park.id == Spot.park_id)).all()
+    return [{
+        "id": spot_id,
+        "name": name,
+        "longitude": longitude,
+        "latitude": latitude,
+        "park_id": park_id,
+        "park": park_name,
+        "actions": actions.get(spot_id, []),
+        "suggester_id": suggester_id,
+        "is_verified": is_verified
+    } for spot_id, name, longitude, latitude, park_id, park_name, suggester_id, is_verified in rows]
+
+
+def list_shopping_items():
+    """
+    Rows of Shopping_item.serialize for every item
+    """
+    rows = db.session.execute(
+        db.select(Shopping_item.id, Shopping_item.name, Shopping_item.price,
+                  Shopping_item.description, Shopping_item.stock, Image.id)
+        .outerjoin(Image, Image.shopping_item_id == Shopping_item.id)).all()
+    return [{
+        "id": item_id,
+        "name": name,
+        "price": price,
+        "description": description,
+        "stock": stock,
+        "image_url": shopping_item_image_url(item_id) if image_id is not None else None
+    } for item_id, name, price, description, stock, image_id in rows]
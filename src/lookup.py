@@ -0,0 +1,41 @@
+"""
+Request-scoped cache for primary and unique key lookups.
+
+Rows fetched through lookup() are kept on flask.g, which lives as long as the
+app context of the current request, so repeated lookups of the same park,
+user or category within one request hit the database once.
+"""
+
+from flask import g, has_app_context
+
+
+def lookup(model, **key):
+    """
+    Return the row of model matching a single primary or unique key column,
+    or None. Found rows are cached for the rest of the app context under
+    both the requested key and their id.
+    """
+    (column, value), = key.items()
+    if not has_app_context():
+        return model.query.filter_by(**key).first()
+
+    cache = g.setdefault("lookup_cache", {})
+    stats = lookup_stats()
+    row = cache.get((model, column, value))
+    if row is not None:
+        stats["hits"] += 1
+        return row
+
+    stats["misses"] += 1
+    row = model.query.filter_by(**key).first()
+    if row is not None:
+        cache[(model, column, value)] = row
+        cache[(model, "id", row.id)] = row
+    return row
+
+
+def lookup_stats():
+    """
+    Return the hit and miss counts of the current app context
+    """
+    return g.setdefault("lookup_stats", {"hits": 0, "misses": 0})
@@ -0,0 +1,68 @@
+"""
+Moderation queue for unverified spots and actions.
+
+Pending items are read oldest-first through the partial indexes on
+is_verified = 0, and the queue sizes live in moderation_queue, kept current
+by SQLite triggers so they never need a COUNT over the whole table.
+"""
+
+from db import db, Spot, Action, Moderation_queue
+
+MODELS = {"spot": Spot, "action": Action}
+
+
+def create_moderation_queue():
+    """
+    Create the queue counter rows and the triggers maintaining them,
+    counting the existing pending items the first time
+    """
+    for kind in MODELS:
+        if Moderation_queue.query.filter_by(kind=kind).first() is None:
+            pending = db.session.execute(db.text(
+                "SELECT COUNT(*) FROM %s WHERE is_verified = 0" % kind)).scalar()
+            db.session.add(Moderation_queue(kind=kind, pending=pending))
+
+        bump = "UPDATE moderation_queue SET pending = pending + %s WHERE kind = '" + kind + "';"
+        db.session.execute(db.text(
+            "CREATE TRIGGER IF NOT EXISTS moderation_%s_insert AFTER INSERT ON %s "
+            "WHEN new.is_verified = 0 BEGIN %s END" % (kind, kind, bump % "1")))
+        db.session.execute(db.text(
+            "CREATE TRIGGER IF NOT EXISTS moderation_%s_update AFTER UPDATE OF is_verified ON %s "
+            "WHEN old.is_verified != new.is_verified BEGIN %s END"
+            % (kind, kind, bump % "(CASE WHEN new.is_verified = 0 THEN 1 ELSE -1 END)")))
+        db.session.execute(db.text(
+            "CREATE TRIGGER IF NOT EXISTS moderation_%s_delete AFTER DELETE ON %s "
+            "WHEN old.is_verified = 0 BEGIN %s END" % (kind, kind, bump % "-1")))
+    db.session.commit()
+
+
+def pending_counts():
+    """
+    Return the number of pending items of each kind
+    """
+    return {row.kind: row.pending for row in Moderation_queue.query.all()}
+
+
+def pending_page(kind, after_id, limit):
+    """
+    Return up to limit pending items of the given kind with an id above
+    after_id, oldest first
+    """
+    model = MODELS[kind]
+    query = model.query
+    if model is Action:
+        query = query.options(db.selectinload(Action.users),
+                              db.selectinload(Action.categories))
+    return query \
+        .filter(model.is_verified == db.false(), model.id > after_id) \
+        .order_by(model.id).limit(limit).all()
+
+
+def pending_ids(kind, ids):
+    """
+    Return which of the given ids are pending items of the given kind
+    """
+    model = MODELS[kind]
+    rows = db.session.query(model.id) \
+        .filter(model.is_verified == db.false(), model.id.in_(ids)).all()
+    return [row_id for (row_id,) in rows]
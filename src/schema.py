@@ -0,0 +1,65 @@
+"""
+In-place upgrades for databases created by an earlier version of the models.
+
+db.create_all() only creates missing tables, so columns added to existing
+tables are added here with ALTER TABLE and filled once from the current rows,
+and indexes added to existing tables are created if missing.
+"""
+
+from db import db
+
+# (table, column, column definition, statement filling the new column)
+COLUMNS = [
+    ("park", "spot_count", "INTEGER NOT NULL DEFAULT 0",
+     "UPDATE park SET spot_count = "
+     "(SELECT COUNT(*) FROM spot WHERE spot.park_id = park.id)"),
+    ("spot", "action_count", "INTEGER NOT NULL DEFAULT 0",
+     "UPDATE spot SET action_count = "
+     "(SELECT COUNT(*) FROM action WHERE action.spot_id = spot.id)"),
+    ("spot", "verified_minutes", "INTEGER NOT NULL DEFAULT 0",
+     "UPDATE spot SET verified_minutes = "
+     "(SELECT COALESCE(SUM(minute_duration), 0) FROM action "
+     "WHERE action.spot_id = spot.id AND action.is_verified = 1)"),
+    ("category", "action_count", "INTEGER NOT NULL DEFAULT 0",
+     "UPDATE category SET action_count = "
+     "(SELECT COUNT(*) FROM association_actions_categories "
+     "WHERE association_actions_categories.category_id = category.id)"),
+    ("shopping_item", "stock", "INTEGER", None),
+    ("image", "binary", "TEXT NOT NULL DEFAULT ''", None),
+]
+
+# Indexes declared on the models that existing tables may lack
+INDEXES = [
+    "ix_association_users_actions_user_id",
+    "ix_action_time",
+    "ix_spot_pending",
+    "ix_action_pending",
+]
+
+
+def existing_columns(table):
+    """
+    Return the names of the columns the database has for table
+    """
+    rows = db.session.execute(db.text('PRAGMA table_info("%s")' % table)).all()
+    return {row[1] for row in rows}
+
+
+def upgrade_schema():
+    """
+    Add and backfill the columns missing from existing tables and create the
+    missing indexes
+    """
+    for table, column, definition, backfill in COLUMNS:
+        if column in existing_columns(table):
+            continue
+        db.session.execute(db.text(
+            'ALTER TABLE "%s" ADD COLUMN %s %s' % (table, column, definition)))
+        if backfill is not None:
+            db.session.execute(db.text(backfill))
+    db.session.commit()
+
+    indexes = {index.name: index
+               for table in db.metadata.sorted_tables for index in table.indexes}
+    for name in INDEXES:
+        indexes[name].create(bind=db.engine, checkfirst=True)
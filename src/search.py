@@ -0,0 +1,95 @@
+"""
+Full-text search over parks, spots and actions backed by an SQLite FTS5 table.
+
+Every searchable row gets one entry in search_index whose rowid encodes the
+source table and primary key (id * 4 + kind code), so triggers can keep the
+index in sync with rowid lookups on insert, update and delete, including
+deletes issued outside the ORM.
+"""
+
+import re
+
+from db import db
+
+KINDS = {"park": 1, "spot": 2, "action": 3}
+
+SOURCES = {
+    "park": ("park", "name", "''", ("name",)),
+    "spot": ("spot", "name", "''", ("name",)),
+    "action": ("action", "title", "description", ("title", "description")),
+}
+
+TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def create_search_index():
+    """
+    Create the FTS5 table and its sync triggers, backfilling existing rows
+    the first time the table is created
+    """
+    exists = db.session.execute(db.text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'search_index'")).first()
+    if exists is None:
+        db.session.execute(db.text(
+            "CREATE VIRTUAL TABLE search_index USING fts5("
+            "kind UNINDEXED, title, body, "
+            "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"))
+        for kind, (table, title, body, _) in SOURCES.items():
+            db.session.execute(db.text(
+                "INSERT INTO search_index (rowid, kind, title, body) "
+                "SELECT id * 4 + %d, '%s', %s, %s FROM %s"
+                % (KINDS[kind], kind, title, body, table)))
+
+    for kind, (table, title, body, columns) in SOURCES.items():
+        code = KINDS[kind]
+        new_title, new_body = "new.%s" % title, body if body == "''" else "new.%s" % body
+        insert = ("INSERT INTO search_index (rowid, kind, title, body) "
+                  "VALUES (new.id * 4 + %d, '%s', %s, %s);" % (code, kind, new_title, new_body))
+        delete = "DELETE FROM search_index WHERE rowid = old.id * 4 + %d;" % code
+        db.session.execute(db.text(
+            "CREATE TRIGGER IF NOT EXISTS search_%s_insert AFTER INSERT ON %s BEGIN %s END"
+            % (table, table, insert)))
+        db.session.execute(db.text(
+            "CREATE TRIGGER IF NOT EXISTS search_%s_update AFTER UPDATE OF %s ON %s BEGIN %s %s END"
+            % (table, ", ".join(columns), table, delete, insert)))
+        db.session.execute(db.text(
+            "CREATE TRIGGER IF NOT EXISTS search_%s_delete AFTER DELETE ON %s BEGIN %s END"
+            % (table, table, delete)))
+    db.session.commit()
+
+
+def build_match(query):
+    """
+    Turn free text into an FTS5 expression matching every word as a prefix,
+    or None when the text has no searchable words
+    """
+    tokens = TOKEN.findall(query)
+    if not tokens:
+        return None
+    return " ".join('"%s"*' % token for token in tokens)
+
+
+def search(query, kind=None, limit=20, offset=0):
+    """
+    Return one page of ranked matches, title hits weighted above body hits
+    """
+    match = build_match(query)
+    if match is None:
+        return []
+    sql = ("SELECT rowid, kind, title, "
+           "snippet(search_index, 2, '[', ']', '...', 12) AS snippet, "
+           "bm25(search_index, 0.0, 10.0, 1.0) AS rank "
+           "FROM search_index WHERE search_index MATCH :match")
+    params = {"match": match, "limit": limit, "offset": offset}
+    if kind is not None:
+        sql += " AND kind = :kind"
+        params["kind"] = kind
+    sql += " ORDER BY rank LIMIT :limit OFFSET :offset"
+    rows = db.session.execute(db.text(sql), params).all()
+    return [{
+        "type": row_kind,
+        "id": rowid // 4,
+        "title": title,
+        "snippet": snippet,
+        "rank": rank
+    } for rowid, row_kind, title, snippet, rank in rows]